@@ -9,20 +9,60 @@ Description: High-performance proxy server with AI-powered routing and advanced
 import asyncio
 import aiohttp
 from aiohttp import web
+from multidict import CIMultiDict
 import logging
 import json
-from urllib.parse import urlparse, urlunparse
+import re
 import random
+import ssl
 
 # Configure advanced logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upstream connection pool sizing and resolver cache lifetime (seconds)
+CONNECTOR_LIMIT = 1024
+CONNECTOR_LIMIT_PER_HOST = 32
+DNS_CACHE_TTL = 300
+
+# Upstream body is relayed in chunks of this size instead of being buffered
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Upstream headers that must not be relayed: hop-by-hop headers (RFC 7230
+# section 6.1) plus the framing headers that no longer apply once the client
+# has decoded the body
+STREAM_EXCLUDED_HEADERS = frozenset({
+    'connection',
+    'keep-alive',
+    'proxy-authenticate',
+    'proxy-authorization',
+    'te',
+    'trailers',
+    'transfer-encoding',
+    'upgrade',
+    'content-length',
+    'content-encoding',
+})
+
+# /health payload is static, so serialize it once at import time
+HEALTH_RESPONSE_BODY = json.dumps({
+    'status': 'operational',
+    'service': 'military_grade_proxy',
+    'version': '1.4.2'
+}).encode()
+
 class AITrafficRouter:
     """
     AI-Powered traffic analysis and routing decision engine.
     Simulates intelligent path selection based on network conditions.
     """
+    # Authority component of an absolute or scheme-relative ('//host/...') URL,
+    # the same span urlparse() reports as netloc
+    _NETLOC_RE = re.compile(r'^(?:[A-Za-z][A-Za-z0-9+.\-]*:)?//([^/?#]*)')
+
+    # Priority routing for educational domains, matched in a single scan
+    _EDUCATIONAL_RE = re.compile(r'\.edu|wikipedia\.org|khanacademy\.org', re.IGNORECASE)
+
     def __init__(self):
         self.route_history = {}
         self.success_rates = {}
@@ -30,11 +70,11 @@ class AITrafficRouter:
     async def analyze_optimal_path(self, target_url, request_headers):
         """Analyzes request patterns to determine the optimal routing strategy."""
         # Simulate AI-based decision making for path selection
-        domain = urlparse(target_url).netloc
+        match = self._NETLOC_RE.match(target_url)
+        domain = match.group(1) if match else ''
         
         # Priority routing for educational domains (simulated AI logic)
-        educational_domains = ['.edu', 'wikipedia.org', 'khanacademy.org']
-        if any(ed in domain for ed in educational_domains):
+        if self._EDUCATIONAL_RE.search(domain):
             return {'strategy': 'direct_ssl', 'priority': 'high'}
         
         # Simulate learning from past successful routes
@@ -80,7 +120,21 @@ class MilitaryGradeProxy:
     async def init_session(self):
         """Initialize the aiohttp client session."""
         timeout = aiohttp.ClientTimeout(total=30)
-        self.session = aiohttp.ClientSession(timeout=timeout)
+
+        # One SSL context for every upstream connection (verification off,
+        # matching the previous per-request verify_ssl=False)
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTOR_LIMIT,
+            limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            use_dns_cache=True,
+            ssl=ssl_context
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
     
     async def handle_proxy_request(self, request):
         """
@@ -106,20 +160,35 @@ class MilitaryGradeProxy:
             async with self.session.get(
                 target_url,
                 headers=stealth_headers,
-                allow_redirects=True,
-                verify_ssl=False
+                allow_redirects=True
             ) as response:
-                # Step 4: Process and Return Response
-                content = await response.read()
-                
-                return web.Response(
-                    body=content,
+                # Step 4: Stream the upstream body back chunk by chunk.
+                # The client transparently decodes the body, so the upstream
+                # framing headers no longer describe what we send.
+                # CIMultiDict keeps repeated headers such as Set-Cookie intact.
+                proxy_response = web.StreamResponse(
                     status=response.status,
-                    headers=dict(response.headers)
+                    headers=CIMultiDict(
+                        (k, v) for k, v in response.headers.items()
+                        if k.lower() not in STREAM_EXCLUDED_HEADERS
+                    )
                 )
-                
+                await proxy_response.prepare(request)
+
+                try:
+                    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                        await proxy_response.write(chunk)
+                    await proxy_response.write_eof()
+                except Exception as e:
+                    # Headers are already sent; all we can do is drop the stream.
+                    logger.error("Proxy stream error: %s", e)
+                    if request.transport is not None:
+                        request.transport.close()
+
+                return proxy_response
+
         except Exception as e:
-            logger.error(f"Proxy error: {str(e)}")
+            logger.error("Proxy error: %s", e)
             return web.Response(
                 text=f"Proxy Error: {str(e)}",
                 status=500
@@ -127,11 +196,7 @@ class MilitaryGradeProxy:
     
     async def health_check(self, request):
         """Health check endpoint for monitoring."""
-        return web.json_response({
-            'status': 'operational',
-            'service': 'military_grade_proxy',
-            'version': '1.4.2'
-        })
+        return web.Response(body=HEALTH_RESPONSE_BODY, content_type='application/json')
     
     async def setup_routes(self, app):
         """Configure application routes."""
@@ -151,7 +216,7 @@ class MilitaryGradeProxy:
         site = web.TCPSite(runner, '0.0.0.0', self.port)
         await site.start()
         
-        logger.info(f"Military-Grade Proxy Server operational on port {self.port}")
+        logger.info("Military-Grade Proxy Server operational on port %s", self.port)
         return runner
 
 # Advanced Bypass Technique Configuration
@@ -10,15 +10,47 @@ import asyncio
 import aiohttp
 import random
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 from enum import Enum
+from urllib.parse import quote
 import logging
-from datetime import datetime, timedelta
-import json
 
 logger = logging.getLogger(__name__)
 
+# URLs fetched through every proxy on each health check (probed concurrently)
+HEALTH_CHECK_URLS = (
+    "http://httpbin.org/ip",
+    "http://httpbin.org/user-agent",
+    "https://www.google.com/gen_204"
+)
+
+# Health-check sizing: proxies checked at once (the number of queue workers in
+# _check_proxies), and a connection pool large enough for all of their probes
+# so none waits on a pool slot (that wait would be counted as proxy latency and
+# against the probe timeout)
+HEALTH_CHECK_CONCURRENCY = 50
+HEALTH_CHECK_CONNECTION_LIMIT = HEALTH_CHECK_CONCURRENCY * len(HEALTH_CHECK_URLS)
+HEALTH_CHECK_CONNECTION_LIMIT_PER_HOST = 10
+HEALTH_CHECK_DNS_CACHE_TTL = 300
+
+# Transient probe failures are retried with capped exponential backoff (seconds)
+HEALTH_CHECK_ATTEMPTS = 3
+HEALTH_CHECK_BACKOFF_BASE = 0.5
+HEALTH_CHECK_BACKOFF_CAP = 5.0
+HEALTH_CHECK_BACKOFF_JITTER = 0.25
+
+# Only connection-level failures and timeouts are worth retrying; errors such as
+# a proxy refusing CONNECT (ClientHttpProxyError), InvalidURL or TooManyRedirects
+# fail the same way every time
+HEALTH_CHECK_RETRYABLE_ERRORS = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ServerTimeoutError,
+    asyncio.TimeoutError
+)
+
+NS_PER_HOUR = 3600 * 10**9
+
 class ProxyHealth(Enum):
     EXCELLENT = 4
     GOOD = 3
@@ -38,7 +70,7 @@ class SchoolBlockerType(Enum):
     SONICWALL = "sonicwall"
     PALOALTO = "paloalto"
 
-@dataclass
+@dataclass(slots=True)
 class ResidentialProxy:
     """Represents a residential proxy endpoint with full metadata."""
     ip: str
@@ -49,18 +81,29 @@ class ResidentialProxy:
     asn: int
     latency: float
     success_rate: float
-    last_used: datetime
+    last_used_ns: int  # time.monotonic_ns() of the last selection
     health: ProxyHealth
     protocol: str = "http"
     username: Optional[str] = None
     password: Optional[str] = None
+    _connection_string: str = field(init=False, repr=False, compare=False, default="")
+    
+    def __post_init__(self):
+        # Endpoint and credentials never change, so build the URL once.
+        # Credentials are percent-encoded so ':' or '@' in them can't break it.
+        if self.username and self.password:
+            self._connection_string = "".join((
+                self.protocol, "://",
+                quote(self.username, safe=""), ":", quote(self.password, safe=""), "@",
+                self.ip, ":", str(self.port)
+            ))
+        else:
+            self._connection_string = "".join((self.protocol, "://", self.ip, ":", str(self.port)))
     
     @property
     def connection_string(self) -> str:
         """Returns the complete connection string."""
-        if self.username and self.password:
-            return f"{self.protocol}://{self.username}:{self.password}@{self.ip}:{self.port}"
-        return f"{self.protocol}://{self.ip}:{self.port}"
+        return self._connection_string
     
     def score(self, blocker_type: Optional[SchoolBlockerType] = None) -> float:
         """Calculates a weighted score for proxy selection with blocker optimization."""
@@ -193,6 +236,9 @@ class AdvancedProxyRotator:
             'Cable One', 'WOW!', 'RCN', 'Frontier Communications'
         ]
         
+        # Read the clock once for the whole pool rather than once per proxy
+        now_ns = time.monotonic_ns()
+        
         for state, cities in states_cities.items():
             state_proxies = []
             
@@ -209,7 +255,7 @@ class AdvancedProxyRotator:
                     asn=random.randint(1000, 50000),
                     latency=random.uniform(30, 400),  # Realistic residential latency
                     success_rate=random.uniform(0.88, 0.98),
-                    last_used=datetime.now() - timedelta(hours=random.randint(1, 72)),
+                    last_used_ns=now_ns - random.randint(1, 72) * NS_PER_HOUR,
                     health=random.choice([ProxyHealth.EXCELLENT, ProxyHealth.GOOD]),
                     username=f"user_{state}_{i}",
                     password=f"pass_{random.randint(10000,99999)}"
@@ -219,7 +265,8 @@ class AdvancedProxyRotator:
             
             self.proxies_by_state[state] = state_proxies
         
-        logger.info(f"Initialized {len(self.proxy_pool)} residential proxies across {len(states_cities)} states")
+        logger.info("Initialized %d residential proxies across %d states",
+                    len(self.proxy_pool), len(states_cities))
     
     def _generate_residential_ip(self, state: str, index: int) -> str:
         """Generate realistic residential IP ranges based on state."""
@@ -248,7 +295,7 @@ class AdvancedProxyRotator:
         
         if target_state and target_state.lower() in self.proxies_by_state:
             candidate_proxies = self.proxies_by_state[target_state.lower()]
-            logger.info(f"Using state-optimized proxies for {target_state}")
+            logger.info("Using state-optimized proxies for %s", target_state)
         
         # Filter by health and latency
         viable_proxies = [
@@ -268,11 +315,11 @@ class AdvancedProxyRotator:
         scored_proxies.sort(reverse=True, key=lambda x: x[0])
         
         best_proxy = scored_proxies[0][1]
-        best_proxy.last_used = datetime.now()
+        best_proxy.last_used_ns = time.monotonic_ns()
         
-        logger.info(f"Selected proxy: {best_proxy.state}/{best_proxy.city} "
-                   f"(ISP: {best_proxy.isp}, Latency: {best_proxy.latency:.2f}ms, "
-                   f"Blocker Score: {scored_proxies[0][0]:.3f})")
+        logger.info("Selected proxy: %s/%s (ISP: %s, Latency: %.2fms, Blocker Score: %.3f)",
+                    best_proxy.state, best_proxy.city, best_proxy.isp,
+                    best_proxy.latency, scored_proxies[0][0])
         
         return best_proxy
     
@@ -316,35 +363,52 @@ class AdvancedProxyRotator:
             chain.append(proxy)
             used_states.add(target_state)
         
-        logger.info(f"Created {len(chain)}-hop proxy chain for {blocker_type}: "
-                   f"{[p.state for p in chain]}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Created %d-hop proxy chain for %s: %s",
+                        len(chain), blocker_type, [p.state for p in chain])
         return chain
     
+    async def initialize(self):
+        """Creates the pooled health-check client shared by every probe."""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=HEALTH_CHECK_CONNECTION_LIMIT,
+                limit_per_host=HEALTH_CHECK_CONNECTION_LIMIT_PER_HOST,
+                ttl_dns_cache=HEALTH_CHECK_DNS_CACHE_TTL,
+                enable_cleanup_closed=True
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+    
+    async def shutdown(self):
+        """Closes the health-check client and its connection pool."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+    
     async def health_check_proxy(self, proxy: ResidentialProxy) -> bool:
         """Performs comprehensive health check on a proxy."""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        if self.session is None:
+            await self.initialize()
         
-        test_urls = [
-            "http://httpbin.org/ip",
-            "http://httpbin.org/user-agent",
-            "https://www.google.com/gen_204"
-        ]
+        test_urls = HEALTH_CHECK_URLS
+        
+        # Probe all test URLs concurrently: the check takes max(rtt), not sum(rtt)
+        results = await asyncio.gather(
+            *(self._probe_with_retry(proxy, test_url) for test_url in test_urls),
+            return_exceptions=True
+        )
         
         success_count = 0
         total_latency = 0
         
-        for test_url in test_urls:
-            try:
-                start_time = time.time()
-                async with self.session.get(test_url, proxy=proxy.connection_string, 
-                                          timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status in [200, 204]:  # 204 is for Google's gen_204
-                        success_count += 1
-                        total_latency += (time.time() - start_time) * 1000
-            except Exception as e:
-                logger.debug(f"Health check failed for {proxy.ip}: {str(e)}")
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.debug("Health check failed for %s: %s", proxy.ip, result)
                 continue
+            ok, latency_ms = result
+            if ok:
+                success_count += 1
+                total_latency += latency_ms
         
         success_rate = success_count / len(test_urls) if test_urls else 0
         avg_latency = total_latency / success_count if success_count else float('inf')
@@ -365,6 +429,62 @@ class AdvancedProxyRotator:
         
         return success_rate >= 0.5
     
+    async def _probe(self, proxy: ResidentialProxy, test_url: str) -> Tuple[bool, float]:
+        """Fetches one test URL through a proxy, returning (ok, latency in ms)."""
+        start_ns = time.perf_counter_ns()
+        async with self.session.get(test_url, proxy=proxy.connection_string, 
+                                  timeout=aiohttp.ClientTimeout(total=10)) as response:
+            # 204 is for Google's gen_204
+            return response.status in [200, 204], (time.perf_counter_ns() - start_ns) / 1e6
+    
+    async def _probe_with_retry(self, proxy: ResidentialProxy, test_url: str) -> Tuple[bool, float]:
+        """Runs _probe, retrying transient network errors with backoff and jitter."""
+        for attempt in range(HEALTH_CHECK_ATTEMPTS - 1):
+            try:
+                return await self._probe(proxy, test_url)
+            except HEALTH_CHECK_RETRYABLE_ERRORS:
+                delay = min(HEALTH_CHECK_BACKOFF_BASE * 2 ** attempt, HEALTH_CHECK_BACKOFF_CAP)
+                await asyncio.sleep(delay + random.uniform(0, HEALTH_CHECK_BACKOFF_JITTER))
+        
+        # Final attempt: any error now propagates to the caller
+        return await self._probe(proxy, test_url)
+    
+    async def _check_proxies(self, proxies: List[ResidentialProxy]) -> int:
+        """
+        Health-checks proxies through a fixed pool of queue workers. At most
+        HEALTH_CHECK_CONCURRENCY proxies are checked at once and in-flight
+        work stays O(workers) however large the cycle is.
+        Returns the number of healthy proxies.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=HEALTH_CHECK_CONCURRENCY)
+        healthy_count = 0
+        
+        async def worker():
+            nonlocal healthy_count
+            while True:
+                proxy = await queue.get()
+                if proxy is None:
+                    return
+                try:
+                    if await self.health_check_proxy(proxy):
+                        healthy_count += 1
+                except Exception as e:
+                    logger.debug("Health check failed for %s: %s", proxy.ip, e)
+        
+        worker_count = min(HEALTH_CHECK_CONCURRENCY, len(proxies))
+        workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+        try:
+            for proxy in proxies:
+                await queue.put(proxy)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        
+        return healthy_count
+    
     async def start_health_monitoring(self):
         """Continuous health monitoring daemon."""
         while True:
@@ -379,14 +499,12 @@ class AdvancedProxyRotator:
                 for state in states_to_check:
                     proxies_to_check.extend(self.proxies_by_state[state])
                 
-                tasks = [self.health_check_proxy(proxy) for proxy in proxies_to_check]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                healthy_count = sum(1 for r in results if r is True)
-                logger.info(f"Health check completed: {healthy_count}/{len(proxies_to_check)} healthy")
+                healthy_count = await self._check_proxies(proxies_to_check)
+                logger.info("Health check completed: %d/%d healthy",
+                            healthy_count, len(proxies_to_check))
                 
             except Exception as e:
-                logger.error(f"Health monitoring error: {str(e)}")
+                logger.error("Health monitoring error: %s", e)
             
             await asyncio.sleep(self.health_check_interval)
     
@@ -419,6 +537,8 @@ async def initialize_proxy_system():
     """Initialize the complete proxy rotation system."""
     logger.info("Initializing military-grade proxy rotation system...")
     
+    await PROXY_ROTATOR.initialize()
+    
     # Start health monitoring as a background task
     asyncio.create_task(PROXY_ROTATOR.start_health_monitoring())
     
@@ -447,6 +567,8 @@ async def main():
     for state, data in list(stats.items())[:5]:
         print(f"{state}: {data['healthy_proxies']}/{data['proxy_count']} healthy, "
               f"Score: {data['avg_blocker_score']:.3f}, {data['recommendation']}")
+    
+    await PROXY_ROTATOR.shutdown()
 
 if __name__ == '__main__':
     asyncio.run(main())